@@ -9,45 +9,113 @@ import argparse
 import json
 import time
 from typing import Dict, List, Optional
-import matplotlib.pyplot as plt
+import matplotlib
+matplotlib.use('Agg')  # reports are rendered to files, never shown
+from matplotlib.figure import Figure
 from watcher import MLLogWatcher
 from utils import (
     MetricPluginManager, StandardMetricParser,
-    WERMetricParser, MetricResult
+    WERMetricParser, MetricResult, lttb
 )
+import numpy as np
 import pandas as pd
 import seaborn as sns
+from io import BytesIO
 from pathlib import Path
+from string import Template
+
+# Email body envelope, built once and filled in for every report
+REPORT_TEMPLATE = Template("""
+        <html>
+        <body>
+        <h2>Training Progress Report</h2>
+        <p>Training Duration: ${hours}h ${minutes}m</p>
+        
+        <h3>Metrics Summary:</h3>
+        <table border="1">
+            <tr>
+                <th>Metric</th>
+                <th>Current</th>
+                <th>Best</th>
+            </tr>
+            ${metrics_summary}
+        </table>
+
+        <h3>Training Plots:</h3>
+        ${plots}
+
+        <h3>Recent Training Log:</h3>
+        <pre>${new_content}</pre>
+        </body>
+        </html>
+        """)
+
+METRIC_ROW = """
+            <tr>
+                <td>{name}</td>
+                <td>{current:.4f}</td>
+                <td>{best:.4f}</td>
+            </tr>"""
+
+# Inline image referencing a plot attached under this Content-ID
+PLOT_IMAGE = """
+        <img src="cid:{name}" alt="{name}">"""
+
+MAIN_PLOT = 'main_metrics.png'
+WER_PLOT = 'wer_progress.png'
 
 
 class ModularMLLogParser:
     """Modular parser for machine learning training logs."""
 
+    # Series longer than this are downsampled before plotting
+    PLOT_POINTS = 2000
+    # An unfinished line held past this many bytes (progress bars redrawn
+    # with \r, binary output) is dropped, up to its eventual newline
+    MAX_PARTIAL_LINE = 64 * 1024
+
     def __init__(self):
         self.plugin_manager = MetricPluginManager()
         self._setup_default_parsers()
+        # One figure reused for every plot instead of building a new one each report
+        self._fig = Figure(figsize=(12, 6))
+        self._ax = self._fig.add_subplot()
+        # plot path -> PNG bytes from the last generate_training_plots call
+        self.plot_images: Dict[str, bytes] = {}
+        # metric name -> (series length when downsampled, xs, ys)
+        self._downsampled: Dict[str, tuple] = {}
+        # Trailing bytes of an unfinished line, held until its newline arrives
+        self._partial = b''
+        # Whether the unfinished line outgrew MAX_PARTIAL_LINE and is skipped
+        self._skip_line = False
 
     def _setup_default_parsers(self):
         """Set up default metric parsers."""
-        # Standard metrics
+        # Standard metrics, fused into one regex
         self.plugin_manager.add_parser(
-            StandardMetricParser('Loss', r'loss[:\s]+([\d\.]+)')
+            StandardMetricParser('Loss', r'loss[:\s]+([\d\.]+)'), fused=True
         )
         self.plugin_manager.add_parser(
-            StandardMetricParser('Accuracy', r'accuracy[:\s]+([\d\.]+)')
+            StandardMetricParser('Accuracy', r'accuracy[:\s]+([\d\.]+)'), fused=True
         )
         self.plugin_manager.add_parser(
-            StandardMetricParser('Val_Loss', r'val_loss[:\s]+([\d\.]+)')
+            StandardMetricParser('Val_Loss', r'val_loss[:\s]+([\d\.]+)'), fused=True
         )
         self.plugin_manager.add_parser(
-            StandardMetricParser('Val_Accuracy', r'val_accuracy[:\s]+([\d\.]+)')
+            StandardMetricParser('Val_Accuracy', r'val_accuracy[:\s]+([\d\.]+)'), fused=True
         )
+        # Custom metrics never join the fused regex, so it is final already
+        self.plugin_manager.compile()
 
         # WER metric
         self.plugin_manager.add_parser(WERMetricParser())
 
     def add_custom_metric(self, name: str, pattern: str):
-        """Add a custom metric parser."""
+        """Add a custom metric parser.
+
+        Custom patterns run on their own rather than in the fused regex, so
+        they may overlap the built-in metrics freely.
+        """
         self.plugin_manager.add_parser(
             StandardMetricParser(name, pattern)
         )
@@ -56,6 +124,88 @@ class ModularMLLogParser:
         """Parse a line of log output."""
         return self.plugin_manager.parse_line(line)
 
+    def _complete_lines(self, chunk: bytes) -> bytes:
+        """Return the complete lines in chunk, holding back an unfinished last line."""
+        last_newline = chunk.rfind(b'\n')
+        if last_newline < 0:
+            self._hold(chunk)
+            return b''
+
+        if self._skip_line:
+            lines = chunk[chunk.find(b'\n') + 1:last_newline + 1]
+        else:
+            lines = self._partial + chunk[:last_newline + 1]
+        self.reset_partial()
+        self._hold(chunk[last_newline + 1:])
+        return lines
+
+    def _hold(self, tail: bytes) -> None:
+        """Add tail to the unfinished line, unless it grows too long."""
+        if self._skip_line:
+            return
+        if len(self._partial) + len(tail) > self.MAX_PARTIAL_LINE:
+            self._partial = b''
+            self._skip_line = True
+        else:
+            self._partial += tail
+
+    def reset_partial(self) -> None:
+        """Forget the unfinished line carried over from earlier input."""
+        self._partial = b''
+        self._skip_line = False
+
+    def parse_chunk(self, chunk: bytes) -> List[MetricResult]:
+        """Parse a raw block of log output, carrying over any incomplete last line."""
+        lines = self._complete_lines(chunk)
+        return self.plugin_manager.parse_chunk(lines) if lines else []
+
+    def parse_chunk_into(self, chunk: bytes) -> None:
+        """Like parse_chunk, but only records values unless results are subscribed to."""
+        lines = self._complete_lines(chunk)
+        if lines:
+            self.plugin_manager.parse_chunk_into(lines)
+
+    def _plot_series(self, metric_name: str, values: np.ndarray):
+        """Return the (xs, ys) to draw for a series, downsampling long ones.
+
+        The downsampled series is cached and only recomputed once the metric
+        has grown by 10%; points logged since then are downsampled on their
+        own to the same density, so the plot stays within ~1.1x PLOT_POINTS.
+        """
+        n = len(values)
+        if n <= self.PLOT_POINTS:
+            return np.arange(n), values
+
+        cached = self._downsampled.get(metric_name)
+        if cached is None or n >= cached[0] * 1.1:
+            xs, ys = lttb(np.arange(n), values, self.PLOT_POINTS)
+            self._downsampled[metric_name] = (n, xs, ys)
+            return xs, ys
+
+        cached_n, xs, ys = cached
+        tail_points = max(3, self.PLOT_POINTS * (n - cached_n) // cached_n)
+        tail_xs, tail_ys = lttb(np.arange(cached_n, n), values[cached_n:], tail_points)
+        return np.concatenate([xs, tail_xs]), np.concatenate([ys, tail_ys])
+
+    def plot_names(self) -> List[str]:
+        """File names generate_training_plots will produce for the current data."""
+        names = [MAIN_PLOT]
+        if 'WER' in self.plugin_manager.get_all_plot_data():
+            names.append(WER_PLOT)
+        return names
+
+    def _save_figure(self, path: str) -> None:
+        """Render the figure once to memory, then write those bytes to path."""
+        png = BytesIO()
+        # Email-sized image with fast, light zlib compression
+        self._fig.savefig(
+            png, format='png', dpi=72,
+            pil_kwargs={'compress_level': 1, 'optimize': False},
+        )
+        data = png.getvalue()
+        Path(path).write_bytes(data)
+        self.plot_images[path] = data
+
     def generate_training_plots(self, save_dir: str) -> List[str]:
         """Generate and save training progress plots."""
         Path(save_dir).mkdir(parents=True, exist_ok=True)
@@ -65,46 +215,45 @@ class ModularMLLogParser:
         plot_data = self.plugin_manager.get_all_plot_data()
 
         # Create main metrics plot
-        plt.figure(figsize=(12, 6))
+        ax = self._ax
+        ax.clear()
         for metric_name, values in plot_data.items():
             if metric_name in ['Loss', 'Val_Loss', 'Accuracy', 'Val_Accuracy']:
-                plt.plot(values, label=metric_name)
-        plt.title('Training Progress - Main Metrics')
-        plt.xlabel('Iteration')
-        plt.ylabel('Value')
-        plt.legend()
-        plt.grid(True)
-        main_plot_path = str(Path(save_dir) / 'main_metrics.png')
-        plt.savefig(main_plot_path)
-        plt.close()
+                ax.plot(*self._plot_series(metric_name, values), label=metric_name)
+        ax.set_title('Training Progress - Main Metrics')
+        ax.set_xlabel('Iteration')
+        ax.set_ylabel('Value')
+        ax.legend()
+        ax.grid(True)
+        main_plot_path = str(Path(save_dir) / MAIN_PLOT)
+        self._save_figure(main_plot_path)
         saved_plots.append(main_plot_path)
 
         # Create WER-specific plot if WER data exists
         if 'WER' in plot_data:
-            plt.figure(figsize=(12, 6))
+            ax.clear()
 
             # Plot WER
-            plt.plot(plot_data['WER'], label='WER', color='red')
+            ax.plot(*self._plot_series('WER', plot_data['WER']), label='WER', color='red')
 
             # Plot error components if available
             if 'Substitutions' in plot_data:
-                plt.plot(plot_data['Substitutions'],
-                         label='Substitutions', linestyle='--')
+                ax.plot(*self._plot_series('Substitutions', plot_data['Substitutions']),
+                        label='Substitutions', linestyle='--')
             if 'Deletions' in plot_data:
-                plt.plot(plot_data['Deletions'],
-                         label='Deletions', linestyle=':')
+                ax.plot(*self._plot_series('Deletions', plot_data['Deletions']),
+                        label='Deletions', linestyle=':')
             if 'Insertions' in plot_data:
-                plt.plot(plot_data['Insertions'],
-                         label='Insertions', linestyle='-.')
-
-            plt.title('WER Progress')
-            plt.xlabel('Iteration')
-            plt.ylabel('Rate')
-            plt.legend()
-            plt.grid(True)
-            wer_plot_path = str(Path(save_dir) / 'wer_progress.png')
-            plt.savefig(wer_plot_path)
-            plt.close()
+                ax.plot(*self._plot_series('Insertions', plot_data['Insertions']),
+                        label='Insertions', linestyle='-.')
+
+            ax.set_title('WER Progress')
+            ax.set_xlabel('Iteration')
+            ax.set_ylabel('Rate')
+            ax.legend()
+            ax.grid(True)
+            wer_plot_path = str(Path(save_dir) / WER_PLOT)
+            self._save_figure(wer_plot_path)
             saved_plots.append(wer_plot_path)
 
         return saved_plots
@@ -119,10 +268,28 @@ class ModularMLLogWatcher(MLLogWatcher):
         """Add a custom metric to track."""
         self.parser.add_custom_metric(name, pattern)
 
+    def on_log_reset(self) -> None:
+        """Don't glue the old file's unfinished line onto the new one."""
+        self.parser.reset_partial()
+
+    def process_chunk(self, chunk: bytes) -> None:
+        """Feed newly read log content to the metric parsers."""
+        self.parser.parse_chunk_into(chunk)
+
+    def send_email(self, subject: str, body: str) -> bool:
+        """Refresh the training plots, then send them with the report."""
+        try:
+            for plot_path in self.parser.generate_training_plots(str(self.plot_dir)):
+                self._cache_plot(plot_path, self.parser.plot_images[plot_path])
+        except Exception as e:
+            # Still send the report, with whatever plots are already on disk
+            print(f"Failed to generate training plots: {str(e)}")
+        return super().send_email(subject, body)
+
     def format_email_body(self, new_content: str) -> str:
         """Format the email body with training metrics and analysis."""
         # Get all current metrics
-        plot_data = self.parser.plugin_manager.get_all_plot_data()
+        summaries = self.parser.plugin_manager.get_all_summaries()
 
         # Calculate training duration
         duration = time.time() - self.training_start_time
@@ -130,40 +297,17 @@ class ModularMLLogWatcher(MLLogWatcher):
         minutes = (duration % 3600) // 60
 
         # Create metrics summary
-        metrics_summary = ""
-        for metric_name, values in plot_data.items():
-            if values:
-                current = values[-1]
-                best = min(values) if 'loss' in metric_name.lower() else max(values)
-                metrics_summary += f"""
-                <tr>
-                    <td>{metric_name}</td>
-                    <td>{current:.4f}</td>
-                    <td>{best:.4f}</td>
-                </tr>"""
-
-        body = f"""
-        <html>
-        <body>
-        <h2>Training Progress Report</h2>
-        <p>Training Duration: {int(hours)}h {int(minutes)}m</p>
-        
-        <h3>Metrics Summary:</h3>
-        <table border="1">
-            <tr>
-                <th>Metric</th>
-                <th>Current</th>
-                <th>Best</th>
-            </tr>
-            {metrics_summary}
-        </table>
+        rows = []
+        for metric_name, (current, best) in summaries.items():
+            rows.append(METRIC_ROW.format(name=metric_name, current=current, best=best))
 
-        <h3>Recent Training Log:</h3>
-        <pre>{new_content}</pre>
-        </body>
-        </html>
-        """
-        return body
+        return REPORT_TEMPLATE.substitute(
+            hours=int(hours),
+            minutes=int(minutes),
+            metrics_summary=''.join(rows),
+            plots=''.join(PLOT_IMAGE.format(name=name) for name in self.parser.plot_names()),
+            new_content=new_content,
+        )
 
 
 def main():
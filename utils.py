@@ -1,14 +1,18 @@
 # --------------------------------------- utf-8 encoding ----------------------------------------------
 from abc import ABC, abstractmethod
 import re
-from typing import Optional, Dict, Any, List
-from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple, NamedTuple, Callable, Iterator
+import numpy as np
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
 
 # wwil kljz rakd yeyn
 
 
-@dataclass
-class MetricResult:
+class MetricResult(NamedTuple):
     """Container for a parsed metric result."""
     name: str
     value: float
@@ -17,9 +21,116 @@ class MetricResult:
     extra_info: Optional[Dict[str, Any]] = None
 
 
+def _literal_prefix(pattern: str) -> Optional[bytes]:
+    """Return the lowercased literal every match of pattern must start with, if any."""
+    if '|' in pattern:
+        return None
+    match = re.match(r'[A-Za-z0-9_]+', pattern)
+    if not match:
+        return None
+    literal = match.group()
+    if pattern[match.end():match.end() + 1] in ('?', '*', '{'):
+        # The quantifier makes the last character optional
+        literal = literal[:-1]
+    return literal.lower().encode() or None
+
+
+def _literal_probe(literals: List[bytes]) -> re.Pattern:
+    """Compile a case-insensitive search for any of the given literals."""
+    return re.compile(b'|'.join(re.escape(literal) for literal in literals), re.IGNORECASE)
+
+
+def _line_matches(regex: re.Pattern, text: bytes) -> Iterator[re.Match]:
+    """Yield regex's matches in a block of lines, none running across a newline.
+
+    Metric patterns are written for a single line, but classes like ``\\s``
+    also match the newline; a match that crosses into the next line is
+    searched for again within its own line. Compile regex with re.MULTILINE
+    so ``^`` and ``$`` anchor at line boundaries.
+    """
+    pos = 0
+    while True:
+        for match in regex.finditer(text, pos):
+            start, end = match.span()
+            newline = text.find(b'\n', start, end)
+            if newline < 0:
+                yield match
+                continue
+            match = regex.search(text, start, newline)
+            if match is None:
+                pos = newline + 1
+            else:
+                yield match
+                pos = max(match.end(), start + 1)
+            break
+        else:
+            return
+
+
+def _match_in_line(regex: re.Pattern, text: bytes, pos: int) -> Optional[re.Match]:
+    """Match regex at pos without letting it run past the end of that line."""
+    match = regex.match(text, pos)
+    if match is not None:
+        newline = text.find(b'\n', pos, match.end())
+        if newline >= 0:
+            match = regex.match(text, pos, newline)
+    return match
+
+
+def lttb(xs: np.ndarray, ys: np.ndarray, n_out: int = 2000) -> Tuple[np.ndarray, np.ndarray]:
+    """Downsample a series with Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last points and, from each bucket in between, the
+    point forming the largest triangle with the previously kept point and
+    the average of the next bucket. Series already within n_out points are
+    returned unchanged.
+    """
+    n = len(ys)
+    if n <= n_out or n_out < 3:
+        return xs, ys
+
+    # n_out - 2 buckets over the interior points, as [edges[i], edges[i + 1])
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(np.int64), n)
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end, next_end = edges[i], edges[i + 1], edges[i + 2]
+        avg_x = xs[end:next_end].mean()
+        avg_y = ys[end:next_end].mean()
+        areas = np.abs(
+            (xs[a] - avg_x) * (ys[start:end] - ys[a])
+            - (xs[a] - xs[start:end]) * (avg_y - ys[a])
+        )
+        a = start + int(areas.argmax())
+        keep[i + 1] = a
+    return xs[keep], ys[keep]
+
+
+def _to_float(raw) -> float:
+    """Convert a captured number (str or bytes), ignoring trailing periods.
+
+    Captures of digits and dots also take the full stop ending a sentence
+    ("loss: 0.3.").
+    """
+    return float(raw.rstrip(b'.' if isinstance(raw, bytes) else '.'))
+
+
+def _is_loss(metric_name: str) -> bool:
+    """Whether lower values of a metric are better, judged by its name."""
+    return 'loss' in metric_name.lower()
+
+
 class BaseMetricParser(ABC):
     """Abstract base class for metric parsers."""
 
+    # Lowercase bytes that must appear in any text this parser can match;
+    # None disables the pre-check
+    literal: Optional[bytes] = None
+
     @abstractmethod
     def parse(self, line: str) -> Optional[MetricResult]:
         """Parse a line of text and return metric if found."""
@@ -30,6 +141,86 @@ class BaseMetricParser(ABC):
         """Return data for plotting."""
         pass
 
+    def parse_chunk(self, chunk: bytes) -> List[MetricResult]:
+        """Parse a block of raw log lines.
+
+        The default decodes the block and feeds it to ``parse`` line by
+        line; parsers that can scan bytes directly should override this.
+        """
+        results = []
+        for line in chunk.decode('utf-8', errors='replace').splitlines():
+            result = self.parse(line)
+            if result:
+                results.append(result)
+        return results
+
+    def parse_into(self, line: str) -> bool:
+        """Record any metric in a line without building a MetricResult.
+
+        Returns whether something was recorded. Parsers should override this
+        when they can skip constructing results.
+        """
+        return self.parse(line) is not None
+
+    def parse_chunk_into(self, chunk: bytes) -> int:
+        """Record metrics from a block of raw log lines, returning how many."""
+        recorded = 0
+        for line in chunk.decode('utf-8', errors='replace').splitlines():
+            recorded += self.parse_into(line)
+        return recorded
+
+    def get_summary(self) -> Dict[str, Tuple[float, float]]:
+        """Return (current, best) for every metric that has values.
+
+        The default rescans the plot data, treating metrics named like a
+        loss as lower-is-better; parsers tracking a running best override it.
+        """
+        return {
+            name: (values[-1], min(values) if _is_loss(name) else max(values))
+            for name, values in self.get_plot_data().items()
+            if len(values)
+        }
+
+
+class MetricBuffer:
+    """Growable float array that keeps a running best of its values.
+
+    One thread may append while others read: append stores the (possibly
+    grown) array before bumping the count, so readers take the count first.
+    """
+
+    def __init__(self, minimize: bool = False, capacity: int = 1024):
+        self._data = np.empty(capacity, dtype=np.float64)
+        self._count = 0
+        self.minimize = minimize
+        self.best = float('inf') if minimize else float('-inf')
+
+    def append(self, value: float) -> None:
+        if self._count == len(self._data):
+            grown = np.empty(2 * len(self._data), dtype=np.float64)
+            grown[:self._count] = self._data
+            self._data = grown
+        self._data[self._count] = value
+        self._count += 1
+        if (value < self.best) if self.minimize else (value > self.best):
+            self.best = value
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def last(self) -> float:
+        count = self._count
+        return float(self._data[count - 1])
+
+    def view(self) -> np.ndarray:
+        """Return the stored values without copying."""
+        count = self._count
+        return self._data[:count]
+
+    def summary(self) -> Tuple[float, float]:
+        return self.last, self.best
+
 
 class StandardMetricParser(BaseMetricParser):
     """Parser for standard metrics like loss and accuracy."""
@@ -37,45 +228,282 @@ class StandardMetricParser(BaseMetricParser):
     def __init__(self, metric_name: str, pattern: str):
         self.metric_name = metric_name
         self.pattern = pattern
-        self.values = []
+        self.literal = _literal_prefix(pattern)
+        self.is_loss = _is_loss(metric_name)
+        self.values = MetricBuffer(minimize=self.is_loss)
+        self._regex = re.compile(pattern, re.IGNORECASE)
+        try:
+            # Chunks hold many lines; anchors must still mean line boundaries
+            self._bregex = re.compile(pattern.encode(), re.IGNORECASE | re.MULTILINE)
+        except re.error:
+            # Pattern relies on str-only syntax; parse_chunk decodes instead
+            self._bregex = None
 
     def parse(self, line: str) -> Optional[MetricResult]:
-        match = re.search(self.pattern, line.lower())
+        match = self._regex.search(line)
         if match:
-            value = float(match.group(1))
-            self.values.append(value)
-            return MetricResult(name=self.metric_name, value=value)
+            return self._record(match)
         return None
 
-    def get_plot_data(self) -> Dict[str, List[float]]:
-        return {self.metric_name: self.values}
+    def parse_chunk(self, chunk: bytes) -> List[MetricResult]:
+        if self._bregex is None:
+            return super().parse_chunk(chunk)
+        return [
+            result for result in map(self._record, _line_matches(self._bregex, chunk))
+            if result is not None
+        ]
+
+    def parse_into(self, line: str) -> bool:
+        match = self._regex.search(line)
+        return match is not None and self._store(match) is not None
+
+    def parse_chunk_into(self, chunk: bytes) -> int:
+        if self._bregex is None:
+            return super().parse_chunk_into(chunk)
+        recorded = 0
+        for match in _line_matches(self._bregex, chunk):
+            if self._store(match) is not None:
+                recorded += 1
+        return recorded
+
+    def _store(self, match: re.Match) -> Optional[float]:
+        """Store the value captured by one of our pattern matches.
+
+        A capture that still isn't a number (e.g. "..." or "1.2.3") is
+        skipped so it costs only that value, not the whole chunk.
+        """
+        try:
+            value = _to_float(match.group(1))
+        except (TypeError, ValueError):
+            return None
+        self.values.append(value)
+        return value
+
+    def _record(self, match: re.Match) -> Optional[MetricResult]:
+        """Store a match's value and wrap it in a MetricResult."""
+        value = self._store(match)
+        if value is None:
+            return None
+        return MetricResult(name=self.metric_name, value=value)
+
+    def get_plot_data(self) -> Dict[str, np.ndarray]:
+        return {self.metric_name: self.values.view()}
+
+    @property
+    def best(self) -> float:
+        return self.values.best
+
+    def get_summary(self) -> Dict[str, Tuple[float, float]]:
+        if not self.values:
+            return {}
+        return {self.metric_name: self.values.summary()}
+
+
+class HyperscanMetricScanner:
+    """Finds every occurrence of the metric patterns' literal prefixes in one pass.
+
+    Only the fixed literals are handed to Hyperscan, so each occurrence
+    fires a single callback; matching the full pattern is left to re at
+    the reported start.
+    """
+
+    def __init__(self, literals: List[bytes]):
+        self._lengths = [len(literal) for literal in literals]
+        self._db = hyperscan.Database()
+        self._db.compile(
+            expressions=[re.escape(literal) for literal in literals],
+            ids=list(range(len(literals))),
+            elements=len(literals),
+            flags=[hyperscan.HS_FLAG_CASELESS] * len(literals),
+        )
+
+    def scan(self, chunk: bytes) -> List[Tuple[int, int]]:
+        """Return sorted (start, literal id) pairs for all occurrences in chunk."""
+        hits = []
+        lengths = self._lengths
+
+        def on_match(literal_id, start, end, flags, context):
+            # Without start-of-match tracking only end is reported
+            hits.append((end - lengths[literal_id], literal_id))
+
+        self._db.scan(chunk, match_event_handler=on_match)
+        hits.sort()
+        return hits
+
+
+class CompositeStandardParser:
+    """Runs several standard metric patterns as a single alternation regex.
+
+    Every member pattern is wrapped in its own named group so one
+    ``finditer`` pass over a line finds all metrics; the owning parser then
+    re-matches at that position to pull out its captured value.
+    """
+
+    def __init__(self):
+        self.parsers: List[StandardMetricParser] = []
+        self._groups: Dict[str, StandardMetricParser] = {}
+        self._regex: Optional[re.Pattern] = None
+        self._bregex: Optional[re.Pattern] = None
+        self._scanner: Optional[HyperscanMetricScanner] = None
+        self._literals: Optional[List[bytes]] = []
+        self._probe: Optional[re.Pattern] = None
+
+    def add_parser(self, parser: StandardMetricParser) -> bool:
+        """Fuse a parser into the composite, returning False if its pattern can't be."""
+        if parser._bregex is None:
+            return False
+        try:
+            re.compile(f'(?P<m>{parser.pattern})')
+        except re.error:
+            return False
+        self.parsers.append(parser)
+        self._regex = self._bregex = self._scanner = self._probe = None
+        if parser.literal is None:
+            self._literals = None
+        elif self._literals is not None:
+            self._literals.append(parser.literal)
+        return True
+
+    def may_match(self, chunk: bytes) -> bool:
+        """Cheaply rule out a chunk that holds none of our literals."""
+        if self._literals is None:
+            return True
+        if self._probe is None:
+            self._probe = _literal_probe(self._literals)
+        return self._probe.search(chunk) is not None
+
+    def compile(self) -> None:
+        """Build the alternation regexes from the registered parsers.
+
+        Happens lazily on the first parse after a parser is added; call it
+        up front once the parser set is final to pay the cost at startup.
+        """
+        self._groups = {f'm{i}': parser for i, parser in enumerate(self.parsers)}
+        alternation = '|'.join(
+            f'(?P<{group}>{parser.pattern})' for group, parser in self._groups.items()
+        )
+        self._regex = re.compile(alternation, re.IGNORECASE)
+        self._bregex = re.compile(alternation.encode(), re.IGNORECASE | re.MULTILINE)
+        if self._literals is not None:
+            self._probe = _literal_probe(self._literals)
+
+        self._scanner = None
+        if hyperscan is not None and self._literals is not None:
+            # Every fused pattern starts with a known literal to look for
+            self._scanner = HyperscanMetricScanner(self._literals)
+
+    def _hits(self, text) -> Iterator[Tuple[StandardMetricParser, re.Match]]:
+        """Yield (owning parser, match) for every metric occurrence in text."""
+        if not self.parsers:
+            return
+        if self._regex is None:
+            self.compile()
+
+        if isinstance(text, str):
+            for match in self._regex.finditer(text):
+                parser = self._groups[match.lastgroup]
+                yield parser, parser._regex.match(text, match.start())
+        elif self._scanner is not None:
+            # Mirror the alternation regex: leftmost hit wins, ties go to the
+            # earlier-registered parser, and hits inside a taken match are skipped
+            taken_until = 0
+            for start, index in self._scanner.scan(text):
+                if start < taken_until:
+                    continue
+                parser = self.parsers[index]
+                match = _match_in_line(parser._bregex, text, start)
+                if match:
+                    yield parser, match
+                    taken_until = match.end()
+        else:
+            for match in _line_matches(self._bregex, text):
+                parser = self._groups[match.lastgroup]
+                yield parser, _match_in_line(parser._bregex, text, match.start())
+
+    def parse(self, line: str) -> List[MetricResult]:
+        """Parse every metric occurrence in a line with a single scan."""
+        return self._results(line)
+
+    def parse_chunk(self, chunk: bytes) -> List[MetricResult]:
+        """Parse every metric occurrence in a block of raw log lines."""
+        return self._results(chunk)
+
+    def _results(self, text) -> List[MetricResult]:
+        """Record every metric occurrence in text and return those that parsed."""
+        results = []
+        for parser, match in self._hits(text):
+            result = parser._record(match)
+            if result is not None:
+                results.append(result)
+        return results
+
+    def parse_chunk_into(self, chunk: bytes) -> int:
+        """Record every metric occurrence in a block without building results."""
+        recorded = 0
+        for parser, match in self._hits(chunk):
+            if parser._store(match) is not None:
+                recorded += 1
+        return recorded
 
 
 class WERMetricParser(BaseMetricParser):
     """Parser specifically for Word Error Rate metric."""
 
+    literal = b'wer'
+
     def __init__(self):
-        self.wer_values = []
-        self.substitutions = []
-        self.deletions = []
-        self.insertions = []
-
-        # Patterns for different WER components
-        self.patterns = {
-            'wer': r'wer[:\s]+([\d\.]+)',
-            'sub': r'substitutions[:\s]+(\d+)',
-            'del': r'deletions[:\s]+(\d+)',
-            'ins': r'insertions[:\s]+(\d+)'
-        }
+        # Lower is better for the rate and for every error count
+        self.wer_values = MetricBuffer(minimize=True)
+        self.substitutions = MetricBuffer(minimize=True)
+        self.deletions = MetricBuffer(minimize=True)
+        self.insertions = MetricBuffer(minimize=True)
+
+        # One alternation for all WER components, keyed by named group
+        self.pattern = (
+            r'wer[:\s]+(?P<wer>[\d\.]+)'
+            r'|substitutions[:\s]+(?P<sub>\d+)'
+            r'|deletions[:\s]+(?P<del>\d+)'
+            r'|insertions[:\s]+(?P<ins>\d+)'
+        )
+        self._combined = re.compile(self.pattern, re.IGNORECASE)
+        self._bcombined = re.compile(self.pattern.encode(), re.IGNORECASE)
+        # Lines that can hold a WER reading; companions must share the line
+        self._line_regex = re.compile(rb'^[^\n]*wer[^\n]*', re.IGNORECASE | re.MULTILINE)
 
     def parse(self, line: str) -> Optional[MetricResult]:
-        line = line.lower()
+        return self._result(self._extract(self._combined, line))
+
+    def parse_chunk(self, chunk: bytes) -> List[MetricResult]:
+        results = []
+        for match in self._line_regex.finditer(chunk):
+            result = self._result(self._extract(self._bcombined, match.group()))
+            if result:
+                results.append(result)
+        return results
+
+    def parse_into(self, line: str) -> bool:
+        return self._extract(self._combined, line) is not None
+
+    def parse_chunk_into(self, chunk: bytes) -> int:
+        recorded = 0
+        for match in self._line_regex.finditer(chunk):
+            if self._extract(self._bcombined, match.group()) is not None:
+                recorded += 1
+        return recorded
+
+    def _extract(self, combined: re.Pattern, line) -> Optional[Dict[str, float]]:
+        """Store the WER reading of a line and return its components, if any."""
         metrics = {}
 
-        for key, pattern in self.patterns.items():
-            match = re.search(pattern, line)
-            if match:
-                metrics[key] = float(match.group(1))
+        for match in combined.finditer(line):
+            # Like separate searches, only the first reading of each component counts
+            key = match.lastgroup
+            if key not in metrics:
+                try:
+                    metrics[key] = _to_float(match.group(key))
+                except ValueError:
+                    # Malformed number such as "1.2.3"; skip just this reading
+                    continue
 
         if 'wer' in metrics:
             self.wer_values.append(metrics['wer'])
@@ -87,27 +515,45 @@ class WERMetricParser(BaseMetricParser):
                 self.deletions.append(metrics['del'])
             if 'ins' in metrics:
                 self.insertions.append(metrics['ins'])
-
-            return MetricResult(
-                name='WER',
-                value=metrics['wer'],
-                extra_info={
-                    'substitutions': metrics.get('sub'),
-                    'deletions': metrics.get('del'),
-                    'insertions': metrics.get('ins')
-                }
-            )
+            return metrics
         return None
 
-    def get_plot_data(self) -> Dict[str, List[float]]:
-        data = {'WER': self.wer_values}
+    def _result(self, metrics: Optional[Dict[str, float]]) -> Optional[MetricResult]:
+        if metrics is None:
+            return None
+        return MetricResult(
+            name='WER',
+            value=metrics['wer'],
+            extra_info={
+                'substitutions': metrics.get('sub'),
+                'deletions': metrics.get('del'),
+                'insertions': metrics.get('ins')
+            }
+        )
+
+    def _buffers(self) -> Dict[str, MetricBuffer]:
+        buffers = {'WER': self.wer_values}
         if self.substitutions:
-            data['Substitutions'] = self.substitutions
+            buffers['Substitutions'] = self.substitutions
         if self.deletions:
-            data['Deletions'] = self.deletions
+            buffers['Deletions'] = self.deletions
         if self.insertions:
-            data['Insertions'] = self.insertions
-        return data
+            buffers['Insertions'] = self.insertions
+        return buffers
+
+    def get_plot_data(self) -> Dict[str, np.ndarray]:
+        return {name: buffer.view() for name, buffer in self._buffers().items()}
+
+    @property
+    def best(self) -> float:
+        return self.wer_values.best
+
+    def get_summary(self) -> Dict[str, Tuple[float, float]]:
+        return {
+            name: buffer.summary()
+            for name, buffer in self._buffers().items()
+            if buffer
+        }
 
 
 class MetricPluginManager:
@@ -115,20 +561,76 @@ class MetricPluginManager:
 
     def __init__(self):
         self.parsers: List[BaseMetricParser] = []
+        self._composite = CompositeStandardParser()
+        # Parsers run on their own, each with an optional literal probe
+        self._standalone: List[Tuple[BaseMetricParser, Optional[re.Pattern]]] = []
+        self._subscribers: List[Callable[[MetricResult], None]] = []
 
-    def add_parser(self, parser: BaseMetricParser):
-        """Add a new metric parser."""
+    def add_parser(self, parser: BaseMetricParser, fused: bool = False):
+        """Add a new metric parser.
+
+        With fused=True a StandardMetricParser joins the shared alternation
+        regex. Only do that for patterns written together with the other fused
+        ones: the leftmost match wins and matches never overlap, so a pattern
+        sharing text with another would silently lose or swallow readings.
+        The built-ins rely on this so a val_loss reading is not also Loss.
+        """
         self.parsers.append(parser)
+        fused = fused and type(parser) is StandardMetricParser
+        if not (fused and self._composite.add_parser(parser)):
+            probe = _literal_probe([parser.literal]) if parser.literal else None
+            self._standalone.append((parser, probe))
 
     def parse_line(self, line: str) -> List[MetricResult]:
         """Parse a line using all registered parsers."""
-        results = []
-        for parser in self.parsers:
+        results = self._composite.parse(line)
+        for parser, _ in self._standalone:
             result = parser.parse(line)
             if result:
                 results.append(result)
         return results
 
+    def parse_chunk(self, chunk: bytes) -> List[MetricResult]:
+        """Parse a block of complete raw log lines using all registered parsers."""
+        results = []
+        if self._composite.may_match(chunk):
+            results = self._composite.parse_chunk(chunk)
+        for parser, probe in self._standalone:
+            if probe is None or probe.search(chunk):
+                results.extend(parser.parse_chunk(chunk))
+        return results
+
+    def subscribe(self, callback: Callable[[MetricResult], None]):
+        """Have callback receive every MetricResult found by parse_chunk_into."""
+        self._subscribers.append(callback)
+
+    def parse_chunk_into(self, chunk: bytes) -> None:
+        """Record metrics from a block of complete raw log lines.
+
+        MetricResult objects are only built when a subscriber wants them;
+        otherwise parsers just append to their buffers.
+        """
+        if self._subscribers:
+            for result in self.parse_chunk(chunk):
+                for callback in self._subscribers:
+                    callback(result)
+            return
+
+        if self._composite.may_match(chunk):
+            self._composite.parse_chunk_into(chunk)
+        for parser, probe in self._standalone:
+            if probe is None or probe.search(chunk):
+                parser.parse_chunk_into(chunk)
+
+    def compile(self) -> None:
+        """Build the fused regex now rather than on the first parse.
+
+        Call once the parsers added with fused=True are all registered;
+        adding another fused parser later recompiles lazily.
+        """
+        if self._composite.parsers:
+            self._composite.compile()
+
     def get_all_plot_data(self) -> Dict[str, Dict[str, List[float]]]:
         """Get plot data from all parsers."""
         plot_data = {}
@@ -137,3 +639,10 @@ class MetricPluginManager:
             for metric_name, values in parser_data.items():
                 plot_data[metric_name] = values
         return plot_data
+
+    def get_all_summaries(self) -> Dict[str, Tuple[float, float]]:
+        """Get (current, best) for every tracked metric."""
+        summaries = {}
+        for parser in self.parsers:
+            summaries.update(parser.get_summary())
+        return summaries
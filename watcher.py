@@ -1,16 +1,64 @@
+import ctypes
+import ctypes.util
 import os
+import queue
+import selectors
+import sys
+import threading
 import time
 import smtplib
+from collections import deque
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict
+from string import Template
+from typing import Optional, List, Dict, Tuple
+
+# inotify event bits for "something in the log's directory was written or replaced"
+IN_MODIFY = 0x00000002
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+
+# Queued between chunks when the log was replaced or truncated
+_LOG_RESET = object()
+
+# Email body envelope, built once and filled in for every report
+REPORT_TEMPLATE = Template("""
+        <html>
+        <body>
+        <h2>Training Progress Report</h2>
+        <p>Training Duration: ${hours}h ${minutes}m</p>
+        <p>Current Epoch: ${current_epoch}</p>
+        
+        <h3>Best Metrics:</h3>
+        <ul>
+            <li>Best Loss: ${best_loss}</li>
+            <li>Best Accuracy: ${best_accuracy}</li>
+            <li>Best Validation Loss: ${best_val_loss}</li>
+            <li>Best Validation Accuracy: ${best_val_accuracy}</li>
+        </ul>
+
+        <h3>Recent Training Log:</h3>
+        <pre>${new_content}</pre>
+        </body>
+        </html>
+        """)
 
 
 class MLLogWatcher:
-    """Base class for ML training log watching and reporting."""
+    """Base class for ML training log watching and reporting.
+
+    While watching, a reader thread reads new bytes of the log and a parser
+    thread runs process_chunk on them, so slow plotting or SMTP work on the
+    main thread never stalls reading or parsing.
+    """
+
+    # Spans the reader may get ahead of the parser before it blocks
+    chunk_queue_size = 64
+    # Most bytes read from the log at once; a large backlog is read in pieces
+    read_size = 1 << 20
 
     def __init__(
         self,
@@ -22,7 +70,8 @@ class MLLogWatcher:
         sender_email: str = None,
         sender_password: str = None,
         recipient_email: str = None,
-        plot_dir: str = "training_plots"
+        plot_dir: str = "training_plots",
+        max_buffer_bytes: int = 256 * 1024  # log tail kept for the next email
     ):
         self.log_file = log_file
         self.check_interval = check_interval
@@ -33,12 +82,36 @@ class MLLogWatcher:
         self.sender_password = sender_password
         self.recipient_email = recipient_email
         self.plot_dir = Path(plot_dir)
+        # plot path -> (mtime, PNG bytes), so unchanged plots aren't re-read
+        self._img_cache: Dict[str, Tuple[float, bytes]] = {}
 
         # File reading state
         self.last_position = 0
-        self.buffer = []
+        self.max_buffer_bytes = max_buffer_bytes
+        self.buffer = deque()
+        self._buffered_bytes = 0
+        self._buffer_lock = threading.Lock()
+        self._fh = None
+        self._file_id = None
+        # Set when the log was replaced or truncated, until on_log_reset is run
+        self._log_reset = False
         self.last_email_time = time.time()
 
+        # Authenticated SMTP connection kept open between reports
+        self._smtp = None
+
+        # Change notification (inotify on Linux); None means plain polling
+        self._inotify_fd = None
+        self._selector = None
+        # Self-pipe that interrupts a selector wait on shutdown
+        self._wake_r = None
+        self._wake_w = None
+
+        # Reader/parser worker threads
+        self._stop = threading.Event()
+        self._chunk_q: queue.Queue = queue.Queue(maxsize=self.chunk_queue_size)
+        self._workers: List[threading.Thread] = []
+
         # Training tracking state
         self.training_start_time = time.time()
         self.current_epoch = 0
@@ -59,21 +132,143 @@ class MLLogWatcher:
         if not all([self.sender_email, self.sender_password, self.recipient_email]):
             raise ValueError("Email configuration is incomplete. Please provide all email credentials.")
 
-    def check_file_changes(self) -> Optional[str]:
-        """Check for new content in the log file."""
+    def _open_log(self) -> None:
+        """(Re)open the log file and remember which file we are reading."""
+        if self._fh is not None:
+            self._fh.close()
+        self._fh = open(self.log_file, 'rb', buffering=1 << 16)
+        st = os.fstat(self._fh.fileno())
+        self._file_id = (st.st_dev, st.st_ino)
+
+    def _log_replaced(self) -> bool:
+        """Whether the log path now names a different file (e.g. after rotation)."""
         try:
-            with open(self.log_file, 'r') as f:
-                f.seek(self.last_position)
-                new_content = f.read()
-                if new_content:
-                    self.last_position = f.tell()
-                    self.buffer.append(new_content)
-                    return new_content
-                return None
+            st = os.stat(self.log_file)
+        except FileNotFoundError:
+            # Rotated away and not recreated yet; keep the old handle
+            return False
+        return (st.st_dev, st.st_ino) != self._file_id
+
+    def _read_chunk(self) -> Optional[bytes]:
+        """Read up to read_size bytes of new log content, or None if there is none."""
+        if self._fh is None:
+            self._open_log()
+        elif self._log_replaced():
+            # Finish what was written to the old file before switching over
+            data = self._read_new()
+            if data:
+                return data
+            self._open_log()
+            self.last_position = 0
+            self._log_reset = True
+
+        if os.fstat(self._fh.fileno()).st_size < self.last_position:
+            # File was truncated in place; start over from the top
+            self.last_position = 0
+            self._log_reset = True
+        return self._read_new()
+
+    def _read_new(self) -> Optional[bytes]:
+        """Read up to read_size bytes past last_position from the open handle."""
+        self._fh.seek(self.last_position)
+        data = self._fh.read(self.read_size)
+        if not data:
+            return None
+        self.last_position += len(data)
+        self._append_buffer(data[-self.max_buffer_bytes:])
+        return data
+
+    def check_file_changes(self) -> Optional[bytes]:
+        """Check for new content in the log file, returning up to read_size raw bytes."""
+        try:
+            return self._read_chunk()
         except Exception as e:
             print(f"Error reading log file: {str(e)}")
             return None
 
+    def _setup_change_notifier(self) -> None:
+        """Watch the log's directory with inotify so waits end as soon as it changes.
+
+        The directory is watched rather than the file so a rotated log that
+        is recreated under the same name still wakes us. Falls back to
+        polling wherever inotify is unavailable.
+        """
+        if not sys.platform.startswith('linux'):
+            return
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                return
+            log_dir = os.path.dirname(os.path.abspath(self.log_file))
+            mask = IN_MODIFY | IN_MOVED_TO | IN_CREATE
+            if libc.inotify_add_watch(fd, os.fsencode(log_dir), mask) < 0:
+                os.close(fd)
+                return
+        except (OSError, AttributeError):
+            return
+
+        self._inotify_fd = fd
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(fd, selectors.EVENT_READ)
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+
+    def _wait_for_change(self, timeout: float) -> None:
+        """Sleep up to timeout seconds, returning early if the log directory
+        changes or the watcher is stopping."""
+        if self._selector is None:
+            self._stop.wait(timeout)
+            return
+        for key, _ in self._selector.select(timeout):
+            # Drain the queued events; we only care that something happened
+            try:
+                while os.read(key.fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def _next_wait(self) -> float:
+        """Time to wait before the next check: the poll interval, or less if an email is due sooner."""
+        until_email = self.last_email_time + self.email_interval - time.time()
+        if until_email > 0:
+            return min(self.check_interval, until_email)
+        return self.check_interval
+
+    def _append_buffer(self, data: bytes) -> None:
+        """Buffer new log bytes, dropping the oldest beyond max_buffer_bytes."""
+        with self._buffer_lock:
+            self.buffer.append(data)
+            self._buffered_bytes += len(data)
+            self._trim_buffer()
+
+    def _trim_buffer(self) -> None:
+        while self._buffered_bytes > self.max_buffer_bytes:
+            excess = self._buffered_bytes - self.max_buffer_bytes
+            head = self.buffer[0]
+            if len(head) <= excess:
+                self.buffer.popleft()
+                self._buffered_bytes -= len(head)
+            else:
+                self.buffer[0] = head[excess:]
+                self._buffered_bytes -= excess
+
+    def _take_buffer(self) -> bytes:
+        """Remove and return everything buffered so far."""
+        with self._buffer_lock:
+            data = b"".join(self.buffer)
+            self.buffer.clear()
+            self._buffered_bytes = 0
+        return data
+
+    def _restore_buffer(self, data: bytes) -> None:
+        """Put content back in front of the buffer after a failed send."""
+        with self._buffer_lock:
+            self.buffer.appendleft(data)
+            self._buffered_bytes += len(data)
+            self._trim_buffer()
+
     def should_send_email(self) -> bool:
         """Determine if it's time to send an email based on the interval."""
         return (time.time() - self.last_email_time) >= self.email_interval
@@ -84,27 +279,60 @@ class MLLogWatcher:
         hours = duration // 3600
         minutes = (duration % 3600) // 60
 
-        body = f"""
-        <html>
-        <body>
-        <h2>Training Progress Report</h2>
-        <p>Training Duration: {int(hours)}h {int(minutes)}m</p>
-        <p>Current Epoch: {self.current_epoch}</p>
-        
-        <h3>Best Metrics:</h3>
-        <ul>
-            <li>Best Loss: {self.best_metrics['loss']:.4f}</li>
-            <li>Best Accuracy: {self.best_metrics['accuracy']:.4f}</li>
-            <li>Best Validation Loss: {self.best_metrics['val_loss']:.4f}</li>
-            <li>Best Validation Accuracy: {self.best_metrics['val_accuracy']:.4f}</li>
-        </ul>
+        return REPORT_TEMPLATE.substitute(
+            hours=int(hours),
+            minutes=int(minutes),
+            current_epoch=self.current_epoch,
+            best_loss=f"{self.best_metrics['loss']:.4f}",
+            best_accuracy=f"{self.best_metrics['accuracy']:.4f}",
+            best_val_loss=f"{self.best_metrics['val_loss']:.4f}",
+            best_val_accuracy=f"{self.best_metrics['val_accuracy']:.4f}",
+            new_content=new_content,
+        )
 
-        <h3>Recent Training Log:</h3>
-        <pre>{new_content}</pre>
-        </body>
-        </html>
-        """
-        return body
+    def _cache_plot(self, plot_path: str, data: bytes) -> None:
+        """Remember the bytes just written to a plot file."""
+        self._img_cache[plot_path] = (os.path.getmtime(plot_path), data)
+
+    def _load_plot(self, plot_file: Path) -> bytes:
+        """Return a plot's bytes, reading the file only if it changed."""
+        key = str(plot_file)
+        mtime = plot_file.stat().st_mtime
+        cached = self._img_cache.get(key)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, plot_file.read_bytes())
+            self._img_cache[key] = cached
+        return cached[1]
+
+    def _ensure_smtp(self) -> smtplib.SMTP:
+        """Return a live, logged-in SMTP connection, reconnecting only if needed."""
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close_smtp()
+
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        try:
+            server.starttls()
+            server.login(self.sender_email, self.sender_password)
+        except Exception:
+            server.close()
+            raise
+        self._smtp = server
+        return server
+
+    def _close_smtp(self) -> None:
+        """Log out of and drop the kept-open SMTP connection, if any."""
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
 
     def send_email(self, subject: str, body: str) -> bool:
         """Send email with the training progress report."""
@@ -125,23 +353,35 @@ class MLLogWatcher:
             # Attach any available plots from the plot directory
             if self.plot_dir.exists():
                 for plot_file in self.plot_dir.glob('*.png'):
-                    with open(plot_file, 'rb') as f:
-                        img = MIMEImage(f.read())
-                        img.add_header('Content-ID', f'<{plot_file.name}>')
-                        msg.attach(img)
+                    img = MIMEImage(self._load_plot(plot_file))
+                    img.add_header('Content-ID', f'<{plot_file.name}>')
+                    msg.attach(img)
 
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.send_message(msg)
+            self._ensure_smtp().send_message(msg)
 
             print(f"Email sent successfully at {datetime.now()}")
             return True
 
         except Exception as e:
             print(f"Failed to send email: {str(e)}")
+            # Don't reuse a connection in an unknown state
+            self._close_smtp()
             return False
 
+    def process_chunk(self, chunk: bytes) -> None:
+        """Process one piece (at most read_size bytes) of new log content.
+
+        Runs on the parser thread, in file order, just before process_buffer.
+        """
+        # Subclasses parse the raw bytes here
+        pass
+
+    def on_log_reset(self) -> None:
+        """Called when the log was replaced or truncated, after all content
+        read from the old file has been processed."""
+        # Subclasses can drop state tied to the old file here
+        pass
+
     def process_buffer(self) -> None:
         """Process the accumulated buffer content."""
         # This method can be overridden by subclasses to implement
@@ -160,32 +400,100 @@ class MLLogWatcher:
         # Create plot directory if it doesn't exist
         self.plot_dir.mkdir(parents=True, exist_ok=True)
 
+        self._setup_change_notifier()
+        self._start_workers()
+        try:
+            self._watch_loop()
+        finally:
+            self._stop_workers()
+            self.cleanup()
+
+    def _start_workers(self) -> None:
+        self._stop.clear()
+        self._workers = [
+            threading.Thread(target=self._reader_loop, name='log-reader', daemon=True),
+            threading.Thread(target=self._parser_loop, name='log-parser', daemon=True),
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def _stop_workers(self) -> None:
+        """Stop reading, let the parser finish queued chunks, and wait for both."""
+        if not self._workers:
+            return
+        reader, parser = self._workers
+        self._stop.set()
+        if self._wake_w is not None:
+            os.write(self._wake_w, b'x')
+        reader.join()
+        self._chunk_q.put(None)
+        parser.join()
+        self._workers = []
+
+    def _reader_loop(self) -> None:
+        """Reader thread: queue new log content, waiting for changes in between."""
+        while not self._stop.is_set():
+            chunk = self.check_file_changes()
+            if self._log_reset:
+                self._log_reset = False
+                self._chunk_q.put(_LOG_RESET)
+            if chunk is None:
+                self._wait_for_change(self.check_interval)
+                continue
+            # A full queue blocks here, pausing reads until the parser catches
+            # up. The parser drains until it sees the stop sentinel, so this
+            # always completes and nothing already read is dropped on shutdown.
+            self._chunk_q.put(chunk)
+
+    def _parser_loop(self) -> None:
+        """Parser thread: run process_chunk on queued chunks until told to stop."""
         while True:
+            chunk = self._chunk_q.get()
+            if chunk is None:
+                return
             try:
-                # Check for new content
-                new_content = self.check_file_changes()
-
-                if new_content:
+                if chunk is _LOG_RESET:
+                    self.on_log_reset()
+                else:
+                    self.process_chunk(chunk)
                     self.process_buffer()
+            except Exception as e:
+                print(f"Error processing log content: {str(e)}")
 
+    def _send_buffered(self, subject: str) -> bool:
+        """Email the buffered log tail, keeping it buffered if the send fails."""
+        pending = self._take_buffer()
+        try:
+            email_body = self.format_email_body(pending.decode('utf-8', errors='replace'))
+            sent = self.send_email(subject, email_body)
+        except BaseException:
+            # Formatting failed or Ctrl-C arrived mid-send; keep the tail
+            self._restore_buffer(pending)
+            raise
+        if not sent:
+            self._restore_buffer(pending)
+        return sent
+
+    def _watch_loop(self) -> None:
+        while True:
+            try:
                 # If we have buffered content and it's time to send an email
                 if self.buffer and self.should_send_email():
-                    email_body = self.format_email_body("".join(self.buffer))
                     subject = f"ML Training Progress Report - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
 
-                    if self.send_email(subject, email_body):
-                        self.buffer = []  # Clear buffer after successful send
+                    if self._send_buffered(subject):
                         self.last_email_time = time.time()
 
-                time.sleep(self.check_interval)
+                time.sleep(self._next_wait())
 
             except KeyboardInterrupt:
                 print("\nStopping log watcher...")
+                # Make sure everything read so far has been parsed
+                self._stop_workers()
                 # Send final report
                 if self.buffer:
-                    email_body = self.format_email_body("".join(self.buffer))
                     subject = f"Final Training Report - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                    self.send_email(subject, email_body)
+                    self._send_buffered(subject)
                 break
 
             except Exception as e:
@@ -194,6 +502,18 @@ class MLLogWatcher:
 
     def cleanup(self) -> None:
         """Cleanup resources before shutting down."""
-        # This method can be overridden by subclasses to implement
-        # specific cleanup logic
-        pass
+        # Subclasses overriding this should call super().cleanup()
+        self._close_smtp()
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+        for fd in (self._wake_r, self._wake_w):
+            if fd is not None:
+                os.close(fd)
+        self._wake_r = self._wake_w = None